@@ -0,0 +1,253 @@
+"""Command line interface.
+
+Subsystems are only imported once a command needs them, so a quick look at
+the stored balances doesn't pay for ccxt, iota or matplotlib.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+import contextlib
+
+
+here = os.path.abspath("TraderBetty/TraderBetty")
+root = os.path.dirname(here)
+CONF = os.path.join(root, "config.ini")
+KEYS = os.path.join(root, "keys.json")
+
+
+class Profiler(object):
+    """Collects import and initialization times for --profile."""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = []
+
+    @contextlib.contextmanager
+    def timed(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((label, time.perf_counter() - start))
+
+    def load(self, module):
+        # Already imported modules would only add zero entries
+        if module in sys.modules:
+            return sys.modules[module]
+        with self.timed("import %s" % module):
+            return importlib.import_module(module)
+
+    def report(self):
+        if not self.enabled or not self.timings:
+            return
+        print("\nStartup profile:")
+        for label, seconds in self.timings:
+            print("  {:<45s} {:8.3f}s".format(label, seconds))
+        print("  {:<45s} {:8.3f}s".format(
+            "total", sum(s for _, s in self.timings)))
+        self.timings = []
+
+
+class App(object):
+    """Builds the handlers on first use."""
+    def __init__(self, config_path, key_file, profiler):
+        self.config_path = config_path
+        self.key_file = key_file
+        self.profiler = profiler
+        self._config = None
+        self._CH = None
+        self._PM = None
+        self._DM = None
+
+    @property
+    def config(self):
+        if self._config is None:
+            config = self.profiler.load("TraderBetty.managers.config")
+            with self.profiler.timed("init FullConfigLoader"):
+                self._config = config.FullConfigLoader(self.config_path)
+        return self._config
+
+    def _load_data_deps(self):
+        # Time the heavy third party imports on their own, not as part of
+        # whichever of our modules happens to import them first
+        for module in ["numpy", "pandas"]:
+            self.profiler.load(module)
+
+    @property
+    def CH(self):
+        if self._CH is None:
+            config = self.config
+            self._load_data_deps()
+            handlers = self.profiler.load("TraderBetty.managers.handlers")
+            self.profiler.load("ccxt")
+            if "iota_wallet" in (config.wallets or []):
+                self.profiler.load("TraderBetty.managers.wallets")
+            with self.profiler.timed("init ConnectionHandler"):
+                self._CH = handlers.ConnectionHandler(
+                    config, None, self.key_file)
+        return self._CH
+
+    @property
+    def PM(self):
+        if self._PM is None:
+            CH = self.CH
+            portfolio = self.profiler.load("TraderBetty.managers.portfolio")
+            with self.profiler.timed("init PortfolioManager"):
+                self._PM = portfolio.PortfolioManager(CH, self.config, None)
+        return self._PM
+
+    @property
+    def DM(self):
+        """Read-only access to the stored data, safe next to a running poll."""
+        if self._PM is not None:
+            return self._PM
+        if self._DM is None:
+            config = self.config
+            self._load_data_deps()
+            data = self.profiler.load("TraderBetty.managers.data")
+            with self.profiler.timed("init DataManager"):
+                self._DM = data.DataManager(config, None, read_only=True)
+        return self._DM
+
+
+# -----------------------------------------------------------------------------
+# Commands
+# -----------------------------------------------------------------------------
+def poll(app, args):
+    PM = app.PM
+    supervisor = None
+    if args.multiprocess:
+        pollers = app.profiler.load("TraderBetty.managers.pollers")
+
+        def start_pollers():
+            supervisor = pollers.PollerSupervisor(
+                PM.exchanges, PM.coins, app.key_file, sleeptime=args.sleeptime)
+            supervisor.start()
+            return supervisor
+
+        supervisor = start_pollers()
+    app.profiler.report()
+    try:
+        while True:
+            changes = app.config.reload(validate=app.CH.check_config)
+            if changes:
+                app.CH.apply_config(changes)
+                PM.apply_config(changes)
+                if supervisor and ("exchanges" in changes or
+                                   "coins" in changes):
+                    supervisor.stop()
+                    supervisor = start_pollers()
+            if supervisor:
+                supervisor.supervise()
+                PM.sync_shared_prices(supervisor.matrix)
+            else:
+                PM.get_last_prices()
+            time.sleep(args.sleeptime)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if supervisor:
+            supervisor.stop()
+
+
+def balances(app, args):
+    if args.offline:
+        print(app.DM.balances)
+        return
+    PM = app.PM
+    for exchange in args.exchange or list(PM.exchanges):
+        PM.get_ex_balance(exchange)
+    for wallet in PM.wallets:
+        if PM.wallets[wallet] is None:
+            print("Balances of %s are not supported yet." % wallet)
+            continue
+        PM.get_wallet_balance(wallet)
+    print(PM.balances)
+
+
+def trades(app, args):
+    PM = app.PM
+    for exchange in args.exchange or list(PM.exchanges):
+        extrades = PM.get_trades(exchange)
+        print("%s: %d trades" % (exchange, len(extrades)))
+
+
+def scan(app, args):
+    etherscan = app.profiler.load("TraderBetty.etherscan")
+    with app.profiler.timed("init Scanner"):
+        scanner = etherscan.Scanner(app.config)
+    print(scanner.check_balance())
+
+
+def report(app, args):
+    reports = app.profiler.load("TraderBetty.report")
+    balances = app.DM.balances
+    os.makedirs(args.output, exist_ok=True)
+    for column in args.columns:
+        if column not in balances.columns:
+            print("%s is not in the stored balances." % column)
+            continue
+        values = balances[column].fillna(0)
+        values = values[values > 0]
+        path = os.path.join(args.output, "%s.%s" % (column, args.format))
+        reports.make_pie_chart(values.index.tolist(), values.tolist(), path,
+                               title=column)
+        print("Wrote %s" % path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="traderbetty",
+        description="Cryptocurrency portfolio manager and arbitrage trader")
+    parser.add_argument("--config", default=CONF, help="path to config.ini")
+    parser.add_argument("--keys", default=KEYS, help="path to keys.json")
+    parser.add_argument("--profile", action="store_true",
+                        help="report import and initialization times")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    cmd = commands.add_parser("poll", help="poll prices until interrupted")
+    cmd.add_argument("--sleeptime", type=float, default=10)
+    cmd.add_argument("--multiprocess", action="store_true",
+                     help="run one poller process per exchange")
+    cmd.set_defaults(func=poll)
+
+    cmd = commands.add_parser("balances", help="show the balances")
+    cmd.add_argument("--exchange", action="append",
+                     help="only update this exchange, can be repeated")
+    cmd.add_argument("--offline", action="store_true",
+                     help="show the stored balances without connecting")
+    cmd.set_defaults(func=balances)
+
+    cmd = commands.add_parser("trades", help="fetch the trade history")
+    cmd.add_argument("--exchange", action="append",
+                     help="only fetch this exchange, can be repeated")
+    cmd.set_defaults(func=trades)
+
+    cmd = commands.add_parser("scan", help="check the ether wallet balances")
+    cmd.set_defaults(func=scan)
+
+    cmd = commands.add_parser("report",
+                              help="render portfolio charts without a display")
+    cmd.add_argument("--output", default="reports",
+                     help="directory to write the charts to")
+    cmd.add_argument("--columns", nargs="+", default=["eur_value"],
+                     help="balance columns to chart")
+    cmd.add_argument("--format", default="png")
+    cmd.set_defaults(func=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler = Profiler(args.profile)
+    app = App(args.config, args.keys, profiler)
+    try:
+        return args.func(app, args)
+    finally:
+        profiler.report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
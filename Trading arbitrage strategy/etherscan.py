@@ -1,11 +1,11 @@
 """Implementation of the etherscan.io API"""
-import os
 import json
-from configparser import ConfigParser
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from TraderBetty.managers.config import read_config
+
 # base url for own scrape
 BASE_URL = "https://api.etherscan.io/api"
 MODULE = "account"
@@ -17,12 +17,7 @@ class Scanner:
     def __init__(self, configfile):
         self.session = requests.Session()
 
-        self.config = ConfigParser()
-
-        if not os.path.isfile(configfile):
-            raise ValueError
-
-        self.config.read(configfile)
+        self.config = read_config(configfile)
         self.config_addresses = self.config.get('ether_wallet', 'addresses').split(',')
 
     def check_balance(self):
@@ -1,7 +1,23 @@
 """Base classes for handlers."""
 import abc
 import os
-from configparser import ConfigParser
+import copy
+from configparser import ConfigParser, Error
+
+
+def read_config(config):
+    """Return ``config`` if it's already parsed, else parse the file."""
+    if isinstance(config, ConfigLoader):
+        return config.parser
+    if isinstance(config, ConfigParser):
+        return config
+    # Check if the path is to valid file
+    if not os.path.isfile(config):
+        raise FileNotFoundError
+    # Read in the config file
+    parser = ConfigParser()
+    parser.read(config)
+    return parser
 
 
 class ConfigLoaderAbstract(metaclass=abc.ABCMeta):
@@ -11,14 +27,7 @@ class ConfigLoaderAbstract(metaclass=abc.ABCMeta):
         self.wallets = wallets if wallets else None
         self.coins = coins if coins else None
 
-        # Check if the path is to valid file
-        if not os.path.isfile(config_file):
-            raise FileNotFoundError
-        # Read in the config file
-        config = ConfigParser()
-        config.read(config_file)
-
-        self.config_file = config
+        self.config_file = read_config(config_file)
         if self.config_file:
             self._load_config()
 
@@ -34,7 +43,7 @@ class ExchangeLoader(ConfigLoaderAbstract):
     def _load_config(self):
         try:
             self.exchanges = self.config_file.get("main", "exchanges").split(",")
-        except KeyError:
+        except (KeyError, Error):
             if self.exchanges is None:
                 print("No exchanges predefined.")
 
@@ -46,7 +55,7 @@ class WalletLoader(ConfigLoaderAbstract):
     def _load_config(self):
         try:
             self.wallets = self.config_file.get("main", "wallets").split(",")
-        except KeyError:
+        except (KeyError, Error):
             if self.wallets is None:
                 print("No wallets predefined.")
 
@@ -58,17 +67,89 @@ class CoinLoader(ConfigLoaderAbstract):
     def _load_config(self):
         try:
             self.coins = self.config_file.get("main", "coins").split(",")
-        except KeyError:
+        except (KeyError, Error):
             if self.coins is None:
                 print("No coins predefined.")
 
 
 class ConfigLoader(object):
+    """Parses the config file once and shares it with every component."""
     def __init__(self, config, exchange_loader, wallet_loader, coin_loader):
         self.config_file = config
-        self.exchanges = exchange_loader(config).exchanges if exchange_loader else None
-        self.wallets = wallet_loader(config).wallets if wallet_loader else None
-        self.coins = coin_loader(config).coins if coin_loader else None
+        self.exchange_loader = exchange_loader
+        self.wallet_loader = wallet_loader
+        self.coin_loader = coin_loader
+        self._rejected_mtime = None
+        self._load()
+
+    def _load(self):
+        self.mtime = os.path.getmtime(self.config_file)
+        self.parser = read_config(self.config_file)
+        loaders = [self.exchange_loader, self.wallet_loader, self.coin_loader]
+        exchanges, wallets, coins = [
+            loader(self.parser) if loader else None for loader in loaders]
+        self.exchanges = exchanges.exchanges if exchanges else None
+        self.wallets = wallets.wallets if wallets else None
+        self.coins = coins.coins if coins else None
+
+        # Wallets are optional, the rest is needed to run at all
+        if self.exchange_loader and not self.exchanges:
+            raise ValueError("No exchanges are configured.")
+        if self.coin_loader and not self.coins:
+            raise ValueError("No coins are configured.")
+
+    def reload(self, validate=None):
+        """Re-read the file if it was modified and return what changed.
+
+        The result maps "exchanges", "wallets" and "coins" to a tuple of
+        added and removed entries, and "sections" to the list of other
+        sections whose contents differ. Empty if nothing changed.
+
+        The file is parsed into a copy first, which is also passed to
+        ``validate`` if given. If parsing or validation fails the problem is
+        printed and the old config is kept.
+        """
+        try:
+            mtime = os.path.getmtime(self.config_file)
+        except OSError as e:
+            print("Config file can't be read, keeping the old config.")
+            print(e)
+            return {}
+        if mtime == self.mtime or mtime == self._rejected_mtime:
+            return {}
+
+        new = copy.copy(self)
+        try:
+            new._load()
+            if validate:
+                validate(new)
+        except (OSError, Error, ValueError) as e:
+            # Report every bad version only once, but retry once it's saved
+            self._rejected_mtime = mtime
+            print("Config file is invalid, keeping the old config.")
+            print(e)
+            return {}
+
+        changes = {}
+        for key in ["exchanges", "wallets", "coins"]:
+            before = getattr(self, key) or []
+            after = getattr(new, key) or []
+            added = [item for item in after if item not in before]
+            removed = [item for item in before if item not in after]
+            if added or removed:
+                changes[key] = (added, removed)
+        old_sections = {name: dict(self.parser[name]) for
+                        name in self.parser.sections()}
+        new_sections = {name: dict(new.parser[name]) for
+                        name in new.parser.sections()}
+        sections = [name for name in set(old_sections) | set(new_sections) if
+                    name != "main" and
+                    old_sections.get(name) != new_sections.get(name)]
+        if sections:
+            changes["sections"] = sections
+
+        self.__dict__.update(new.__dict__)
+        return changes
 
 
 class ConnectionConfigLoader(ConfigLoader):
@@ -1,22 +1,135 @@
 """Provides all data management methods."""
-import os
+import time
+import functools
 import pandas as pd
 
 from TraderBetty.managers.handlers import DataHandler
+from TraderBetty.managers.journal import Journal, save_snapshot
+
+
+def journaled(method):
+    """Append the call to the journal before it is applied."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.read_only and not self._replaying:
+            raise RuntimeError("DataManager was opened read-only.")
+        self._journal(method.__name__, args, kwargs)
+        result = method(self, *args, **kwargs)
+        self._maybe_snapshot()
+        return result
+    return wrapper
 
 
 class DataManager(DataHandler):
+    PRICE_STORE_INTERVAL = 60
+    SNAPSHOT_RECORDS = 1000
+    SNAPSHOT_INTERVAL = 600
+    _prices_stored = 0
+    _replaying = False
+
+    def __init__(self, config_path, config_loader, read_only=False):
+        # A read-only manager replays the journal in memory but never writes
+        # to it, the snapshot or any other file, so it can look at the data
+        # while another process writes
+        self.read_only = read_only
+        self.journal = None
+        self._journal_records = 0
+        self._snapshot_taken = time.time()
+        super().__init__(config_path, config_loader)
+        if self.config_changes and not read_only:
+            self.snapshot()
+
+    # -------------------------------------------------------------------------
+    # Journal and snapshot methods
+    # -------------------------------------------------------------------------
+    def _open_journal(self):
+        self.journal = Journal(self.JOURNAL_PATH)
+        if not self.read_only:
+            self.journal.lock()
+
+    def _replay(self):
+        """Re-apply the journal records that are newer than the snapshot."""
+        self.seq = self.snapshot_seq
+        self._replaying = True
+        self._pending_csv = {}
+        if self.read_only:
+            records = self.journal.records()
+        else:
+            records = self.journal.replay()
+        try:
+            for seq, method, args, kwargs in records:
+                if seq <= self.snapshot_seq:
+                    continue
+                if seq != self.seq + 1:
+                    # The writer compacted the journal while we were reading
+                    print("Journal records %d to %d are missing, the data "
+                          "may be slightly out of date." % (self.seq + 1,
+                                                            seq - 1))
+                self.seq = seq
+                try:
+                    getattr(self, method)(*args, **kwargs)
+                except Exception as e:
+                    print("Skipping journal record %d (%s), it failed with:" %
+                          (seq, method))
+                    print(repr(e))
+        finally:
+            self._replaying = False
+        # Every touched file is written once with its final contents
+        for path, (df, index) in self._pending_csv.items():
+            self.store_csv(df, path, index=index)
+        self._pending_csv = {}
+        if self.seq > self.snapshot_seq:
+            self.snapshot()
+
+    def _journal(self, method, args, kwargs):
+        if self._replaying:
+            return
+        self.seq += 1
+        self.journal.append((self.seq, method, args, kwargs))
+        self._journal_records += 1
+
+    def _maybe_snapshot(self):
+        if self._replaying:
+            return
+        if self._journal_records >= self.SNAPSHOT_RECORDS or \
+                time.time() - self._snapshot_taken > self.SNAPSHOT_INTERVAL:
+            self.snapshot()
+
+    def snapshot(self):
+        """Store the whole state and start a new journal."""
+        if self.read_only:
+            return
+        self.snapshot_seq = self.seq
+        save_snapshot(self.SNAPSHOT_PATH, self._state())
+        self.journal.reset()
+        self._journal_records = 0
+        self._snapshot_taken = time.time()
+
+    def store_csv(self, df, path, index=True):
+        if self.read_only:
+            return
+        if self._replaying:
+            self._pending_csv[path] = (df, index)
+            return
+        super().store_csv(df, path, index=index)
+
+    def apply_config(self, changes):
+        super().apply_config(changes)
+        self.snapshot()
+
+    # -------------------------------------------------------------------------
+    # Update methods
+    # -------------------------------------------------------------------------
+    @journaled
     def update_balance(self, column, balance):
         balance = pd.Series(balance, name=column)
         self.balances[column] = balance
         self.balances.fillna(0, inplace=True)
-        self.balances["total"] = self.balances[
-            [c for c in list(self.balances.columns) if
-             c in list(self.exchanges) + list(self.wallets)]
-        ].sum(axis=1)
+        self.balances["total"] = self._total_balance()
         self.store_csv(
             self.balances, self.BALANCE_PATH)
 
+    @journaled
     def update_trades(self, exchange, extrades):
         # Update exchange specific trades
         extr_path = "%s/trades_%s.csv" % (self.DATA_PATH,
@@ -40,34 +153,46 @@ class DataManager(DataHandler):
         self.trades = tradesdf.copy()
         self.store_csv(tradesdf, self.TRADES_PATH)
 
+    # Prices aren't journaled. They change on every sweep, are saved to
+    # prices.npz and merged by update time when restoring a snapshot.
     def update_ex_price(self, exchange, symbol, price):
-        expr_path = "%s/prices_%s.csv" % (self.DATA_PATH,
-                                          exchange)
-        pricedf = self.exprices[exchange]
-        base, quote = symbol.split("/")
-        pricedf.loc[base, quote] = price
-        self.store_csv(pricedf, expr_path)
+        self.prices.update(exchange, [symbol], last=[price])
+        self.store_prices()
+
+    def update_ex_prices(self, exchange, tickers):
+        self.prices.update_tickers(exchange, tickers)
+        self.store_prices()
+
+    def store_prices(self, force=False):
+        if self._replaying or self.read_only:
+            return
+        now = time.time()
+        if force or now - self._prices_stored > self.PRICE_STORE_INTERVAL:
+            self.prices.save(self.PRICES_PATH)
+            self._prices_stored = now
 
+    @journaled
     def update_order_book(self, exchange, symbol, order_book):
         path = "{:s}/orderbook_{:s}_{:s}.csv".format(
             self.ORDERBOOK_PATH, exchange, symbol.replace("/", "_"))
-        if not os.path.isfile(path):
+        if symbol not in self.order_books[exchange]:
             self.order_books[exchange][symbol] = pd.DataFrame(
                 columns=["bids", "asks", "timestamp", "datetime", "none"])
             self.store_csv(self.order_books[exchange][symbol], path)
         exobdf = self.order_books[exchange][symbol].copy()
         if not exobdf.index.name == "datetime":
             exobdf.set_index("datetime", inplace=True)
-        exobdf = exobdf.comine_first(
+        exobdf = exobdf.combine_first(
             order_book.set_index("datetime")
         )
         self.order_books[exchange][symbol] = exobdf.copy()
         self.store_csv(exobdf, path)
 
+    @journaled
     def update_ohlcv(self, exchange, symbol, freq, ohlcv):
         path = "{:s}/ohlcv_{:s}_{:s}_{:s}.csv".format(
             self.OHLCV_PATH, exchange, symbol.replace("/", "_"), freq)
-        if not os.path.isfile(path):
+        if symbol + freq not in self.ohlcvs[exchange]:
             self.ohlcvs[exchange][symbol + freq] = pd.DataFrame(
                 columns=["datetime", "timestamp", "open", "high", "low",
                          "close", "volume"])
@@ -4,14 +4,18 @@ import json
 from json.decoder import JSONDecodeError
 import pandas as pd
 
-import ccxt
-
-from TraderBetty.managers import wallets
+from TraderBetty.managers.config import ConfigLoader
+from TraderBetty.managers.journal import write_atomic, load_snapshot
+from TraderBetty.managers.prices import PriceTensor
 
 
 class Handler(object):
     def __init__(self, config, config_loader):
-        self.config_loader = config_loader(config)
+        # Share an already parsed config instead of reading the file again
+        if isinstance(config, ConfigLoader):
+            self.config_loader = config
+        else:
+            self.config_loader = config_loader(config)
 
 
 class ConnectionHandler(Handler):
@@ -20,9 +24,10 @@ class ConnectionHandler(Handler):
         # Check if the path is to a valid file
         if not os.path.isfile(key_file):
             raise ValueError
+        self.key_file = key_file
 
         self.exchanges = self.config_loader.exchanges
-        self.wallets = self.config_loader.wallets
+        self.wallets = self.config_loader.wallets or []
 
         # Initiate exchanges
         self.exchanges = {exchange: None for exchange in self.exchanges}
@@ -36,34 +41,80 @@ class ConnectionHandler(Handler):
     # Setup functions
     # -------------------------------------------------------------------------
     def _load_exchanges(self, key_file):
+        import ccxt
+
         # Load the api keys from keys file
         with open(key_file) as file:
             keys = json.load(file)
         for exchange in self.exchanges:
+            if self.exchanges[exchange] is not None:
+                continue
             exchange_config = {}
             exchange_config.update(keys[exchange])
             self.exchanges[exchange] = getattr(ccxt, exchange)(exchange_config)
 
-    def _initiate_all_markets(self, reload=False):
+    def _initiate_all_markets(self, reload=False, exchanges=None):
         """
 
         :param reload:
+        :param exchanges: only load the markets of these exchanges
         :return:
         """
-        for exchange in self.exchanges:
+        if exchanges is None:
+            exchanges = self.exchanges
+        for exchange in exchanges:
             try:
                 self.exchanges[exchange].load_markets(reload=reload)
             except JSONDecodeError:
                 print("Exchange %s seems to be unavailable at the moment" %
-                      exchange.name)
+                      exchange)
 
     def load_wallets(self):
-        config = self.config_loader.config_file
+        from TraderBetty.managers import wallets
+
+        config = self.config_loader.parser
         # TODO: implement wallet address tracking for other coins
         for wallet in self.wallets:
-            if wallet == "iota_wallet":
+            if wallet == "iota_wallet" and self.wallets[wallet] is None:
                 self.wallets[wallet] = wallets.IotaWallet(config)
 
+    def check_config(self, config_loader):
+        """Raise ValueError if an exchange can't be connected."""
+        import ccxt
+
+        with open(self.key_file) as file:
+            keys = json.load(file)
+        for exchange in config_loader.exchanges:
+            if not hasattr(ccxt, exchange):
+                raise ValueError("%s is not supported by ccxt." % exchange)
+            if exchange not in keys:
+                raise ValueError("No keys for %s in %s." %
+                                 (exchange, self.key_file))
+
+    def apply_config(self, changes):
+        """Connect added and drop removed exchanges and wallets.
+
+        The dicts are changed in place so everyone holding them sees the
+        new connections.
+        """
+        added, removed = changes.get("exchanges", ([], []))
+        for exchange in removed:
+            self.exchanges.pop(exchange, None)
+        if added:
+            self.exchanges.update({exchange: None for exchange in added})
+            self._load_exchanges(self.key_file)
+            self._initiate_all_markets(exchanges=added)
+
+        added, removed = changes.get("wallets", ([], []))
+        for wallet in removed:
+            self.wallets.pop(wallet, None)
+        self.wallets.update({wallet: None for wallet in added})
+        if "iota_wallet" in changes.get("sections", []) and \
+                "iota_wallet" in self.wallets:
+            # Reconnect to pick up the new node and addresses
+            self.wallets["iota_wallet"] = None
+        self.load_wallets()
+
 
 class DataHandler(Handler):
     def __init__(self, config_path, config_loader):
@@ -73,9 +124,14 @@ class DataHandler(Handler):
         self.TRADES_PATH = self.DATA_PATH + "/trades.csv"
         self.ORDERBOOK_PATH = self.DATA_PATH + "/order_books"
         self.OHLCV_PATH = self.DATA_PATH + "/ohlcv"
+        self.FIAT_RATES_PATH = self.DATA_PATH + "/fiat_rates.json"
+        self.PRICES_PATH = self.DATA_PATH + "/prices.npz"
+        self.SNAPSHOT_PATH = self.DATA_PATH + "/state.snapshot"
+        self.JOURNAL_PATH = self.DATA_PATH + "/state.journal"
+        self._open_journal()
         self.coins = self.config_loader.coins
         self.exchanges = self.config_loader.exchanges
-        self.wallets = self.config_loader.wallets
+        self.wallets = self.config_loader.wallets or []
         self.extrades_paths = [self.DATA_PATH + "/trades_%s.csv" %
                                exchange for exchange in self.exchanges]
 
@@ -90,52 +146,158 @@ class DataHandler(Handler):
                 "exchange", "id", "date", "datetime", "timestamp"])
             self.store_csv(trades, self.TRADES_PATH, index=False)
         for exchange in self.exchanges:
-            extrades_path = self.DATA_PATH + "/trades_%s.csv" % exchange
-            if not os.path.isfile(extrades_path):
-                extrades = pd.DataFrame(columns=[
-                    "exchange", "id", "date", "datetime", "timestamp"])
-                self.store_csv(extrades, extrades_path, index=False)
-            exprice_path = self.DATA_PATH + "/prices_%s.csv" % exchange
-            if not os.path.isfile(exprice_path):
-                exprices = pd.DataFrame(index=self.coins, columns=self.coins)
-                self.store_csv(exprices, exprice_path)
-
-        self.balances = self._load_balances()
-        self.trades = self._load_trades()
-
-        self.extrades = {exchange: self._load_ex_trades(exchange) for
-                         exchange in self.exchanges}
-        self.exprices = {exchange: self._load_ex_prices(exchange) for
-                         exchange in self.exchanges}
-
-        all_order_books = [f for f in os.listdir(self.ORDERBOOK_PATH) if
-                         os.path.isfile(self.ORDERBOOK_PATH + "/" + f)]
-        self.order_books = {ex: {} for ex in self.exchanges}
-        for ex in self.order_books:
-            ex_files = [f for f in all_order_books if ex in f]
-            symbols = [
-                "/".join([s.split("_")[-2], s.split("_")[-1].split(".")[0]])
-                for s in ex_files]
-            ex_books = [pd.read_csv(
-                self.ORDERBOOK_PATH + "/" + f,
-                sep=";", parse_dates=True, index_col=["datetime"]
-            ) for f in ex_files]
-            self.order_books[ex] = {s: ob for s, ob in zip(symbols, ex_books)}
-
-        all_ohlcvs = [f for f in os.listdir(self.OHLCV_PATH) if
-                      os.path.isfile(self.OHLCV_PATH + "/" + f)]
-        self.ohlcvs = {ex: {} for ex in self.exchanges}
-        for ex in self.ohlcvs:
-            ex_files = [f for f in all_ohlcvs if ex in f]
-            symbols = ["/".join([s.split("_")[-3],
-                                 s.split("_")[-2] +
-                                 s.split("_")[-1].split(".")[0]]) for
-                       s in ex_files]
-            ex_ohlcvs = [pd.read_csv(
-                self.OHLCV_PATH + "/" + f,
-                sep=";", parse_dates=True, index_col=["datetime"]
-            ) for f in ex_files]
-            self.ohlcvs[ex] = {s: ohlcv for s, ohlcv in zip(symbols, ex_ohlcvs)}
+            self._init_ex_trades(exchange)
+
+        self.snapshot_seq = 0
+        self.config_changes = {}
+        snapshot = load_snapshot(self.SNAPSHOT_PATH)
+        if snapshot:
+            self.config_changes = self._restore(snapshot)
+        else:
+            self.balances = self._load_balances()
+            self.trades = self._load_trades()
+
+            self.extrades = {exchange: self._load_ex_trades(exchange) for
+                             exchange in self.exchanges}
+            self.prices = self._load_prices()
+
+            self.order_books = {ex: self._load_ex_order_books(ex) for
+                                ex in self.exchanges}
+            self.ohlcvs = {ex: self._load_ex_ohlcvs(ex) for
+                           ex in self.exchanges}
+
+        # The journal was written against the snapshot's exchanges and coins,
+        # so it is replayed before the current config is applied
+        self._replay()
+        if snapshot:
+            # prices.npz is stored more often than the snapshot. Merge it
+            # after the replay so its newer quotes are what's kept.
+            self._merge_stored_prices()
+        if self.config_changes:
+            DataHandler.apply_config(self, self.config_changes)
+
+    def _merge_stored_prices(self):
+        if not os.path.isfile(self.PRICES_PATH):
+            return
+        try:
+            self.prices.merge(PriceTensor.load(self.PRICES_PATH))
+        except Exception as e:
+            print("Prices could not be read from %s." % self.PRICES_PATH)
+            print(e)
+
+    def _open_journal(self):
+        """Hook for subclasses that keep a journal of their updates."""
+
+    def _replay(self):
+        """Hook for subclasses that keep a journal of their updates."""
+
+    def _restore(self, snapshot):
+        """Take the state from a snapshot instead of parsing every csv.
+
+        The snapshot's own exchanges, wallets and coins are kept and the
+        differences to the current config are returned.
+        """
+        self.snapshot_seq = snapshot["seq"]
+        self.balances = snapshot["balances"]
+        self.trades = snapshot["trades"]
+        self.extrades = snapshot["extrades"]
+        self.prices = snapshot["prices"]
+        self.order_books = snapshot["order_books"]
+        self.ohlcvs = snapshot["ohlcvs"]
+
+        changes = {}
+        for key in ["exchanges", "wallets", "coins"]:
+            before, after = snapshot[key], getattr(self, key)
+            added = [item for item in after if item not in before]
+            removed = [item for item in before if item not in after]
+            if added or removed:
+                changes[key] = (added, removed)
+            setattr(self, key, list(before))
+        self.extrades_paths = [self.DATA_PATH + "/trades_%s.csv" %
+                               exchange for exchange in self.exchanges]
+        return changes
+
+    def _state(self):
+        return {"seq": self.snapshot_seq, "exchanges": list(self.exchanges),
+                "wallets": list(self.wallets), "coins": list(self.coins),
+                "balances": self.balances, "trades": self.trades,
+                "extrades": self.extrades, "prices": self.prices,
+                "order_books": self.order_books, "ohlcvs": self.ohlcvs}
+
+    def _total_balance(self):
+        return self.balances[
+            [c for c in list(self.balances.columns) if
+             c in list(self.exchanges) + list(self.wallets)]
+        ].sum(axis=1)
+
+    def _init_ex_trades(self, exchange):
+        extrades_path = self.DATA_PATH + "/trades_%s.csv" % exchange
+        if not os.path.isfile(extrades_path):
+            extrades = pd.DataFrame(columns=[
+                "exchange", "id", "date", "datetime", "timestamp"])
+            self.store_csv(extrades, extrades_path, index=False)
+
+    def _load_ex_order_books(self, ex):
+        ex_files = [f for f in os.listdir(self.ORDERBOOK_PATH) if
+                    os.path.isfile(self.ORDERBOOK_PATH + "/" + f) and ex in f]
+        symbols = [
+            "/".join([s.split("_")[-2], s.split("_")[-1].split(".")[0]])
+            for s in ex_files]
+        ex_books = [pd.read_csv(
+            self.ORDERBOOK_PATH + "/" + f,
+            sep=";", parse_dates=True, index_col=["datetime"]
+        ) for f in ex_files]
+        return {s: ob for s, ob in zip(symbols, ex_books)}
+
+    def _load_ex_ohlcvs(self, ex):
+        ex_files = [f for f in os.listdir(self.OHLCV_PATH) if
+                    os.path.isfile(self.OHLCV_PATH + "/" + f) and ex in f]
+        symbols = ["/".join([s.split("_")[-3],
+                             s.split("_")[-2] +
+                             s.split("_")[-1].split(".")[0]]) for
+                   s in ex_files]
+        ex_ohlcvs = [pd.read_csv(
+            self.OHLCV_PATH + "/" + f,
+            sep=";", parse_dates=True, index_col=["datetime"]
+        ) for f in ex_files]
+        return {s: ohlcv for s, ohlcv in zip(symbols, ex_ohlcvs)}
+
+    def apply_config(self, changes):
+        """Resize the stored data to the reloaded exchanges and coins.
+
+        Only the files of added exchanges are read, everything else is
+        reindexed in memory.
+        """
+        ex_added, ex_removed = changes.get("exchanges", ([], []))
+        coins_added, coins_removed = changes.get("coins", ([], []))
+        w_added, w_removed = changes.get("wallets", ([], []))
+        self.coins = self.config_loader.coins
+        self.exchanges = self.config_loader.exchanges
+        self.wallets = self.config_loader.wallets or []
+        self.extrades_paths = [self.DATA_PATH + "/trades_%s.csv" %
+                               exchange for exchange in self.exchanges]
+
+        for exchange in ex_removed:
+            for store in [self.extrades, self.order_books, self.ohlcvs]:
+                store.pop(exchange, None)
+        for exchange in ex_added:
+            self._init_ex_trades(exchange)
+            self.extrades[exchange] = self._load_ex_trades(exchange)
+            self.order_books[exchange] = self._load_ex_order_books(exchange)
+            self.ohlcvs[exchange] = self._load_ex_ohlcvs(exchange)
+
+        if ex_added or ex_removed or coins_added or coins_removed:
+            self.prices = self.prices.reindex(self.exchanges, self.coins)
+        if ex_added or ex_removed or coins_added or coins_removed or \
+                w_added or w_removed:
+            self.balances = self.balances.reindex(index=self.coins).drop(
+                columns=ex_removed + w_removed, errors="ignore")
+            for column in ex_added + w_added:
+                if column not in self.balances.columns:
+                    self.balances[column] = 0
+            self.balances.fillna(0, inplace=True)
+            self.balances["total"] = self._total_balance()
+            self.store_csv(self.balances, self.BALANCE_PATH)
 
     def _load_balances(self):
         try:
@@ -172,5 +334,26 @@ class DataHandler(Handler):
         except FileNotFoundError:
             print("Prices for %s were not found." % exchange)
 
+    def _load_prices(self):
+        if os.path.isfile(self.PRICES_PATH):
+            return PriceTensor.load(self.PRICES_PATH).reindex(
+                self.exchanges, self.coins)
+        # Migrate the last prices from the old per exchange csv files
+        prices = PriceTensor(self.exchanges, self.coins)
+        for exchange in self.exchanges:
+            if not os.path.isfile("%s/prices_%s.csv" % (self.DATA_PATH,
+                                                        exchange)):
+                continue
+            lpdf = self._load_ex_prices(exchange).stack()
+            symbols = [base + "/" + quote for base, quote in lpdf.index]
+            prices.update(exchange, symbols, last=lpdf.values)
+        return prices
+
+    @property
+    def exprices(self):
+        return {exchange: self.prices.frame(exchange) for
+                exchange in self.exchanges}
+
     def store_csv(self, df, path, index=True):
-        df.to_csv(path, sep=";", index=index)
+        write_atomic(path, lambda file: df.to_csv(file, sep=";", index=index),
+                     mode="w", newline="")
@@ -0,0 +1,125 @@
+"""Write-ahead journal, snapshots and atomic file writes."""
+import os
+import zlib
+import fcntl
+import pickle
+import struct
+import tempfile
+
+
+# Every journal record is prefixed with its length and crc32
+HEADER = struct.Struct("<II")
+
+
+def write_atomic(path, write, mode="wb", **kwargs):
+    """Call ``write(file)`` on a temporary file and rename it to ``path``.
+
+    Readers and restarts see either the old or the new file, never a
+    partially written one.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_snapshot(path, state):
+    write_atomic(path, lambda file: pickle.dump(
+        state, file, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_snapshot(path):
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Also covers snapshots pickled by other versions of our classes
+        print("Snapshot %s could not be read, ignoring it." % path)
+        print(e)
+        return None
+
+
+class Journal(object):
+    """Append-only log of records that haven't made it into a snapshot."""
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def lock(self):
+        """Become the only process that writes to the journal.
+
+        Raises RuntimeError if another process already holds the lock.
+        """
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        try:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.close()
+            raise RuntimeError("%s is in use by another process." % self.path)
+
+    def append(self, record):
+        if self.file is None:
+            self.lock()
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self.file.write(HEADER.pack(len(data), zlib.crc32(data)) + data)
+        self.file.flush()
+
+    def records(self, truncate=False):
+        """Yield the stored records in order.
+
+        Reading stops at a torn record at the end, left by a crash during
+        ``append`` or by a writer that is still appending. With ``truncate``
+        it is cut off so new records are appended after the last complete
+        one; only the process holding the lock may do that.
+        """
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            good = 0
+            while True:
+                header = file.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc = HEADER.unpack(header)
+                data = file.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    break
+                good = file.tell()
+                yield pickle.loads(data)
+            end = file.seek(0, os.SEEK_END)
+        if truncate and good < end:
+            print("Dropping a torn record at the end of %s." % self.path)
+            with open(self.path, "r+b") as file:
+                file.truncate(good)
+
+    def replay(self):
+        """Yield the stored records and cut off a torn one at the end."""
+        return self.records(truncate=True)
+
+    def reset(self):
+        """Empty the journal once its records are in a snapshot."""
+        if self.file is None:
+            self.lock()
+        # Truncate through the locked handle so the lock is kept
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,219 @@
+"""Runs the exchange price pollers in separate worker processes."""
+import json
+import time
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+PRICE_FIELDS = ["bid", "ask", "last"]
+SIZE_FIELDS = ["bidVolume", "askVolume"]
+
+
+def make_symbols(coins):
+    return [base + "/" + quote for base, quote in
+            itertools.permutations(coins, 2)]
+
+
+class SharedPriceMatrix(object):
+    """Exchange x symbol quotes stored in shared memory.
+
+    Every exchange row is written by a single poller and guarded by its own
+    sequence number. The writer makes the number odd before it touches the
+    row and even again afterwards, so a reader knows its view is consistent
+    if the number was even and unchanged over the whole read.
+    """
+    def __init__(self, exchanges, symbols, name=None, create=True):
+        self.exchanges = list(exchanges)
+        self.symbols = list(symbols)
+        self.exchange_index = {ex: i for i, ex in enumerate(self.exchanges)}
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+        n_ex, n_sym = len(self.exchanges), len(self.symbols)
+        layout = [("seq", np.int64, (n_ex,)),
+                  ("timestamp", np.float64, (n_ex, n_sym)),
+                  ("prices", np.float64, (n_ex, n_sym, len(PRICE_FIELDS))),
+                  ("sizes", np.float64, (n_ex, n_sym, len(SIZE_FIELDS)))]
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for
+                   _, dtype, shape in layout)
+        self.shm = shared_memory.SharedMemory(name=name, create=create,
+                                              size=size)
+        offset = 0
+        for attr, dtype, shape in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                               offset=offset)
+            setattr(self, attr, array)
+            offset += array.nbytes
+        if create:
+            self.seq[:] = 0
+            self.timestamp[:] = np.nan
+            self.prices[:] = np.nan
+            self.sizes[:] = np.nan
+
+    @property
+    def spec(self):
+        """Everything a worker process needs to attach to the matrix."""
+        return {"name": self.shm.name, "exchanges": self.exchanges,
+                "symbols": self.symbols}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["exchanges"], spec["symbols"], name=spec["name"],
+                   create=False)
+
+    def close(self):
+        # Drop the views first, the buffer can't be released while exported
+        del self.seq, self.timestamp, self.prices, self.sizes
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    # -------------------------------------------------------------------------
+    # Writer side
+    # -------------------------------------------------------------------------
+    def claim_row(self, exchange):
+        """Make the row's seq even again if a previous writer died mid-write.
+
+        Only the process that is about to become the row's writer may call
+        this. A torn row is cleared while the seq is still odd.
+        """
+        row = self.exchange_index[exchange]
+        if self.seq[row] % 2:
+            self.prices[row] = np.nan
+            self.sizes[row] = np.nan
+            self.timestamp[row] = np.nan
+            self.seq[row] += 1
+
+    def write_tickers(self, exchange, tickers):
+        row = self.exchange_index[exchange]
+        symbols = [s for s in tickers if s in self.symbol_index]
+        if not symbols:
+            return
+        cols = [self.symbol_index[s] for s in symbols]
+        prices = np.array([[tickers[s].get(f) for f in PRICE_FIELDS] for
+                           s in symbols], dtype=np.float64)
+        sizes = np.array([[tickers[s].get(f) for f in SIZE_FIELDS] for
+                          s in symbols], dtype=np.float64)
+        timestamps = np.array([tickers[s].get("timestamp") for s in symbols],
+                              dtype=np.float64)
+
+        self.seq[row] += 1
+        self.prices[row, cols] = prices
+        self.sizes[row, cols] = sizes
+        self.timestamp[row, cols] = timestamps
+        self.seq[row] += 1
+
+    # -------------------------------------------------------------------------
+    # Reader side
+    # -------------------------------------------------------------------------
+    def read(self, exchange, func, retries=1000):
+        """Call ``func(prices, sizes, timestamp)`` on a consistent row.
+
+        The arguments are views into shared memory, so ``func`` has to copy
+        anything it wants to keep after it returns.
+        """
+        row = self.exchange_index[exchange]
+        for attempt in range(retries):
+            if attempt:
+                # Let the writer finish instead of burning the retries
+                time.sleep(0 if attempt < 10 else 0.001)
+            start = self.seq[row]
+            if start % 2:
+                continue
+            result = func(self.prices[row], self.sizes[row],
+                          self.timestamp[row])
+            if self.seq[row] == start:
+                return result
+        print("Could not get a consistent read for %s." % exchange)
+        return None
+
+    def snapshot(self, exchange):
+        return self.read(exchange, lambda p, s, t: (p.copy(), s.copy(),
+                                                    t.copy()))
+
+
+def poll_exchange(spec, exchange, exchange_config, sleeptime):
+    """Worker loop writing the tickers of one exchange into the matrix."""
+    import ccxt
+
+    matrix = SharedPriceMatrix.attach(spec)
+    matrix.claim_row(exchange)
+    try:
+        ex = getattr(ccxt, exchange)(exchange_config)
+        ex.load_markets()
+        symbols = [s for s in matrix.symbols if s in ex.symbols]
+        delay = ex.rateLimit / 1000
+        while True:
+            if ex.has["fetchTickers"]:
+                tickers = ex.fetch_tickers()
+            else:
+                tickers = {}
+                for symbol in symbols:
+                    tickers[symbol] = ex.fetch_ticker(symbol)
+                    time.sleep(delay)
+            matrix.write_tickers(exchange, tickers)
+            time.sleep(max(sleeptime, delay))
+    finally:
+        matrix.close()
+
+
+class PollerSupervisor(object):
+    """Starts one poller process per exchange and restarts failed ones."""
+    def __init__(self, exchanges, coins, key_file, sleeptime=10,
+                 max_backoff=300):
+        with open(key_file) as file:
+            self.keys = json.load(file)
+        self.exchanges = list(exchanges)
+        self.sleeptime = sleeptime
+        self.max_backoff = max_backoff
+        self.matrix = SharedPriceMatrix(self.exchanges, make_symbols(coins))
+
+        self._context = mp.get_context("spawn")
+        self.processes = {ex: None for ex in self.exchanges}
+        self.started = {ex: 0 for ex in self.exchanges}
+        self.failures = {ex: 0 for ex in self.exchanges}
+        self.restart_at = {ex: 0 for ex in self.exchanges}
+
+    def _start(self, exchange):
+        process = self._context.Process(
+            target=poll_exchange, name="poller-%s" % exchange, daemon=True,
+            args=(self.matrix.spec, exchange, self.keys.get(exchange, {}),
+                  self.sleeptime))
+        process.start()
+        self.processes[exchange] = process
+        self.started[exchange] = time.time()
+
+    def start(self):
+        for exchange in self.exchanges:
+            self._start(exchange)
+
+    def supervise(self):
+        """Restart dead pollers, backing off on repeated failures."""
+        now = time.time()
+        for exchange, process in self.processes.items():
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                print("Poller for %s exited with code %s." %
+                      (exchange, process.exitcode))
+                if now - self.started[exchange] > self.max_backoff:
+                    self.failures[exchange] = 0
+                self.failures[exchange] += 1
+                self.restart_at[exchange] = now + min(
+                    2 ** self.failures[exchange], self.max_backoff)
+                self.processes[exchange] = None
+            if now >= self.restart_at[exchange]:
+                self._start(exchange)
+
+    def stop(self):
+        for process in self.processes.values():
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            if process is not None:
+                process.join()
+        self.matrix.close()
+        self.matrix.unlink()
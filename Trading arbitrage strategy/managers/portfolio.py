@@ -5,27 +5,45 @@ from json.decoder import JSONDecodeError
 import time
 import datetime as dt
 import calendar
-import itertools
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-
-from ccxt import errors
-from forex_python.converter import CurrencyRates
 
 from TraderBetty.managers.data import DataManager
+from TraderBetty.managers.rates import FiatRates
+
+FIAT = ["USD", "EUR", "USDT"]
 
 
 class PortfolioManager(DataManager):
+    # Prices older than this many seconds are not used for valuation
+    PRICE_MAX_AGE = 3600
+
     def __init__(self, CH, config_path, config_loader):
         super().__init__(config_path, config_loader)
-        self.c = CurrencyRates()
+        self.CH = CH
+        self.rates = FiatRates(self.FIAT_RATES_PATH,
+                               interval=self._fiat_interval())
         self.exchanges = CH.exchanges
         self.wallets = CH.wallets
 
         self.updates = {ex: {} for ex in self.exchanges}
 
+    def _fiat_interval(self):
+        config = self.config_loader.parser
+        return config.getint("fiat", "interval", fallback=60) * 60
+
+    def apply_config(self, changes):
+        super().apply_config(changes)
+        self.exchanges = self.CH.exchanges
+        self.wallets = self.CH.wallets
+        added, removed = changes.get("exchanges", ([], []))
+        for exchange in removed:
+            self.updates.pop(exchange, None)
+        self.updates.update({ex: {} for ex in added})
+        if "fiat" in changes.get("sections", []):
+            self.rates.interval = self._fiat_interval()
+
     # -------------------------------------------------------------------------
     # Interactions with the wallets
     # -------------------------------------------------------------------------
@@ -58,6 +76,8 @@ class PortfolioManager(DataManager):
         return balance
 
     def get_trades(self, exchange, since=None, store=True):
+        from ccxt.base import errors
+
         ex = self.exchanges[exchange]
         try:
             trades = ex.fetch_my_trades(since=since)
@@ -108,9 +128,9 @@ class PortfolioManager(DataManager):
             if verbose:
                 print("%s is not available on %s." % (symbol, ex.name))
             return None
-        lp = ex.fetch_ticker(symbol)["last"]
-        self.update_ex_price(exchange, symbol, lp)
-        return lp
+        ticker = ex.fetch_ticker(symbol)
+        self.update_ex_prices(exchange, {symbol: ticker})
+        return ticker["last"]
 
     def get_last_prices(self, exchanges=None):
         if not exchanges:
@@ -118,23 +138,22 @@ class PortfolioManager(DataManager):
         for exchange in exchanges:
             ex = self.exchanges[exchange]
             delay = (ex.rateLimit / 1000)
-            tickers = ex.fetch_tickers() if ex.has["fetchTickers"] else None
-            lpdf = self.exprices[exchange]
-            bases = lpdf.index.tolist()
-            quotes = list(lpdf.columns)
-            symbols = [
-                base + "/" + quote for base, quote in
-                itertools.product(bases, quotes) if base != quote]
-            symbols = filter(lambda s: s in ex.symbols, symbols)
-            for symbol in symbols:
-                if tickers:
-                    lp = tickers.get(symbol, None)
-                    lp = lp["last"] if lp else None
-                    # There could be a problem here if called for a symbol that's not in my coins
-                    self.update_ex_price(exchange, symbol, lp)
-                else:
+            ex_symbols = set(ex.symbols)
+            symbols = [s for s in self.prices.symbols if s in ex_symbols]
+            if ex.has["fetchTickers"]:
+                tickers = ex.fetch_tickers()
+                self.update_ex_prices(exchange, {
+                    s: tickers[s] for s in symbols if s in tickers})
+            else:
+                for symbol in symbols:
                     self.get_last_price(exchange, symbol, verbose=False)
                     time.sleep(delay)
+        self.store_prices(force=True)
+
+    def sync_shared_prices(self, matrix):
+        """Copy the quotes written by the poller processes."""
+        self.prices.update_matrix(matrix)
+        self.store_prices()
 
     def get_all_ex_lp(self, symbol, exchanges=None):
         prices = {}
@@ -230,35 +249,54 @@ class PortfolioManager(DataManager):
         self.update_balance("btc_value", btcttls)
         return btcttls
 
-    def get_fiatvalue(self, coin, fiat="USD"):
+    def _best_prices(self, quote):
+        if quote not in self.prices.coin_index:
+            return pd.Series(np.nan, index=self.prices.coins)
+        return self.prices.best(quote, max_age=self.PRICE_MAX_AGE)
+
+    def get_usd_prices(self, coins=None, update=False):
+        """Price every coin once in USD from the price tensor."""
+        if update:
+            self.get_last_prices()
+        if coins is None:
+            ttls = self.balances["total"]
+            coins = ttls[ttls > 0].index.tolist()
+        usd = self._best_prices("USD")
+        if not np.isnan(usd.get("USDT", np.nan)):
+            self.rates.set_rate("USDT", usd["USDT"], "USD")
+        usd = usd.fillna(
+            self._best_prices("USDT") * self.rates.rate("USDT", "USD"))
+        usd = usd.fillna(
+            self._best_prices("BTC") * usd.get("BTC", np.nan))
+        for coin in FIAT:
+            if coin in usd.index:
+                usd[coin] = self.rates.rate(coin, "USD")
+        usd = usd.reindex(coins)
+        for coin in usd[usd.isnull()].index:
+            print("{:s} cannot be converted to USD.".format(coin))
+        return usd
+
+    def get_fiatvalue(self, coin, fiat="USD", update=False):
+        bal = self.balances["total"][coin]
+        usdprice = self.get_usd_prices([coin], update=update)[coin]
+        if np.isnan(usdprice):
+            return None
+        return self.rates.convert(bal * usdprice, "USD", fiat)
+
+    def get_ttl_fiatvalue(self, fiat="USD", update=True):
+        rate = self.rates.rate("USD", fiat)
+        if np.isnan(rate):
+            print("No exchange rate for {:s} available.".format(fiat))
+            return None
         ttls = self.balances["total"]
-        bal = ttls[coin]
-        conv_dict = self.is_convertible_to(coin)
-        if conv_dict[fiat]:
-            fiatbal = self.convert_coin(coin, fiat, amount=bal)
-        elif conv_dict["USDT"]:
-            usdtbal = self.convert_coin(coin, "USDT", amount=bal)
-            fiatbal = self.convert_coin("USDT", "USD", amount=usdtbal)
-        elif conv_dict["BTC"]:
-            btcbal = self.convert_coin(coin, "BTC", amount=bal)
-            fiatbal = self.convert_coin("BTC", "USD", amount=btcbal)
-        else:
-            print("{:s} cannot be converted to {:s}.".format(coin, fiat))
-            fiatbal = None
-        return fiatbal
+        usdprices = self.get_usd_prices(update=update).reindex(ttls.index)
+        fiatttls = self.rates.convert(
+            (ttls * usdprices).fillna(0), "USD", fiat)
+        self.update_balance("%s_value" % fiat.lower(), fiatttls)
+        return fiatttls
 
     def get_ttl_eurvalue(self):
-        ttls = self.balances["total"]
-        eurttls = []
-        for coin in ttls.index.tolist():
-            bal = ttls[coin]
-            eurbal = 0
-            if bal > 0:
-                eurbal = self.get_fiatvalue(coin, fiat="EUR")
-            eurttls.append(eurbal)
-        eurttls = pd.Series(eurttls, index=ttls.index)
-        self.update_balance("eur_value", eurttls)
-        return eurttls
+        return self.get_ttl_fiatvalue("EUR")
 
     def get_prtf_value(self, quote="EUR", update=False):
         if update:
@@ -266,22 +304,3 @@ class PortfolioManager(DataManager):
         if quote == "EUR":
             total = self.balances["eur_value"].sum()
             return total
-
-    # -------------------------------------------------------------------------
-    # Plotting methods
-    # -------------------------------------------------------------------------
-    def make_pie_chart(self, labels, sizes, title=None, edgecolor="k"):
-        # Set style parameters
-        if not edgecolor:
-            mpl.rcParams['patch.force_edgecolor'] = False
-        else:
-            mpl.rcParams['patch.force_edgecolor'] = True
-            mpl.rcParams['patch.edgecolor'] = edgecolor
-
-        # Make figure
-        fig1, ax1 = plt.subplots()
-        ax1.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
-        ax1.axis("equal")
-        if title:
-            ax1.set_title(title)
-        plt.show()
@@ -0,0 +1,164 @@
+"""Provides the dense exchange x base x quote price tensor."""
+import time
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from TraderBetty.managers.journal import write_atomic
+
+
+PLANES = ["bid", "ask", "last"]
+
+
+class PriceTensor(object):
+    """Bid, ask and last prices of every coin pair on every exchange.
+
+    ``data`` has the shape (plane, exchange, base, quote) and ``updated``
+    holds the unix time each (exchange, base, quote) cell was last written.
+    Both are handed out as read-only views, slice them instead of copying.
+    """
+    def __init__(self, exchanges, coins):
+        self.exchanges = list(exchanges)
+        self.coins = list(coins)
+        self.exchange_index = {ex: i for i, ex in enumerate(self.exchanges)}
+        self.coin_index = {c: i for i, c in enumerate(self.coins)}
+        n_ex, n_c = len(self.exchanges), len(self.coins)
+        self._data = np.full((len(PLANES), n_ex, n_c, n_c), np.nan)
+        self._updated = np.zeros((n_ex, n_c, n_c))
+
+    @property
+    def data(self):
+        view = self._data.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def updated(self):
+        view = self._updated.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def symbols(self):
+        return [base + "/" + quote for base, quote in
+                itertools.permutations(self.coins, 2)]
+
+    def plane(self, field="last"):
+        return self.data[PLANES.index(field)]
+
+    def frame(self, exchange, field="last"):
+        """Base x quote DataFrame on top of the tensor, without copying."""
+        prices = self.plane(field)[self.exchange_index[exchange]]
+        return pd.DataFrame(prices, index=self.coins, columns=self.coins,
+                            copy=False)
+
+    def best(self, quote, field="last", max_age=None):
+        """Highest price of every coin in ``quote`` across all exchanges.
+
+        Cells that weren't updated within ``max_age`` seconds are ignored.
+        """
+        q = self.coin_index[quote]
+        prices = self.plane(field)[:, :, q]
+        if max_age is not None:
+            stale = self._updated[:, :, q] < time.time() - max_age
+            prices = np.where(stale, np.nan, prices)
+        return pd.Series(np.fmax.reduce(prices, axis=0), index=self.coins)
+
+    # -------------------------------------------------------------------------
+    # Update methods
+    # -------------------------------------------------------------------------
+    def symbol_coords(self, symbols):
+        """Base and quote coordinates of ``symbols`` and a mask of the known."""
+        pairs = [s.split("/") for s in symbols]
+        bases = np.array([self.coin_index.get(p[0], -1) for p in pairs],
+                         dtype=np.intp)
+        quotes = np.array([self.coin_index.get(p[-1], -1) for p in pairs],
+                          dtype=np.intp)
+        return bases, quotes, (bases >= 0) & (quotes >= 0)
+
+    def update(self, exchange, symbols, bid=None, ask=None, last=None,
+               timestamp=None):
+        row = self.exchange_index[exchange]
+        bases, quotes, known = self.symbol_coords(symbols)
+        bases, quotes = bases[known], quotes[known]
+        for field, values in zip(PLANES, [bid, ask, last]):
+            if values is None:
+                continue
+            values = np.asarray(values, dtype=np.float64)[known]
+            self._data[PLANES.index(field), row, bases, quotes] = values
+        if timestamp is None:
+            timestamp = np.full(len(symbols), time.time())
+        self._updated[row, bases, quotes] = np.asarray(
+            timestamp, dtype=np.float64)[known]
+
+    def update_tickers(self, exchange, tickers):
+        symbols = list(tickers)
+        fields = {field: [tickers[s].get(field) for s in symbols] for
+                  field in PLANES}
+        now = time.time()
+        timestamp = [tickers[s]["timestamp"] / 1000 if
+                     tickers[s].get("timestamp") else now for s in symbols]
+        self.update(exchange, symbols, timestamp=timestamp, **fields)
+
+    def update_matrix(self, matrix):
+        """Copy the quotes of a SharedPriceMatrix into the tensor."""
+        from TraderBetty.managers.pollers import PRICE_FIELDS
+
+        columns = [PRICE_FIELDS.index(field) for field in PLANES]
+        bases, quotes, known = self.symbol_coords(matrix.symbols)
+        now = time.time()
+        for exchange in matrix.exchanges:
+            if exchange not in self.exchange_index:
+                continue
+            row = self.exchange_index[exchange]
+
+            def copy_row(prices, sizes, timestamp):
+                seen = known & ~np.isnan(prices).all(axis=1)
+                b, q = bases[seen], quotes[seen]
+                self._data[:, row, b, q] = prices[seen][:, columns].T
+                self._updated[row, b, q] = np.where(
+                    np.isnan(timestamp[seen]), now, timestamp[seen] / 1000)
+
+            matrix.read(exchange, copy_row)
+
+    # -------------------------------------------------------------------------
+    # Storage methods
+    # -------------------------------------------------------------------------
+    def reindex(self, exchanges, coins):
+        """New tensor for ``exchanges`` and ``coins`` keeping known cells."""
+        tensor = PriceTensor(exchanges, coins)
+        ex_old = [self.exchange_index[ex] for ex in tensor.exchanges if
+                  ex in self.exchange_index]
+        ex_new = [tensor.exchange_index[ex] for ex in tensor.exchanges if
+                  ex in self.exchange_index]
+        c_old = [self.coin_index[c] for c in tensor.coins if
+                 c in self.coin_index]
+        c_new = [tensor.coin_index[c] for c in tensor.coins if
+                 c in self.coin_index]
+        old = np.ix_(ex_old, c_old, c_old)
+        new = np.ix_(ex_new, c_new, c_new)
+        tensor._data[(slice(None),) + new] = self._data[(slice(None),) + old]
+        tensor._updated[new] = self._updated[old]
+        return tensor
+
+    def merge(self, other):
+        """Take the cells of ``other`` that were updated more recently."""
+        other = other.reindex(self.exchanges, self.coins)
+        newer = other._updated > self._updated
+        self._data[:, newer] = other._data[:, newer]
+        self._updated[newer] = other._updated[newer]
+
+    def save(self, path):
+        write_atomic(path, lambda file: np.savez(
+            file, data=self._data, updated=self._updated,
+            exchanges=np.array(self.exchanges), coins=np.array(self.coins)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            tensor = cls(stored["exchanges"].tolist(),
+                         stored["coins"].tolist())
+            tensor._data[:] = stored["data"]
+            tensor._updated[:] = stored["updated"]
+        return tensor
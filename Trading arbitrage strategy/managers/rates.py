@@ -0,0 +1,112 @@
+"""Provides cached fiat exchange rates."""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from TraderBetty.managers.journal import write_atomic
+
+
+class FiatRates(object):
+    """Keeps a table of fiat rates against a single base currency.
+
+    The whole table is fetched at most once per ``interval`` seconds and
+    stored in ``path`` so the rates are available when starting offline.
+    Stablecoins listed in ``pegs`` are quoted against the fiat they track
+    until a market rate is set with ``set_rate``.
+    """
+    def __init__(self, path, base="USD", interval=3600, pegs=None,
+                 retry_after=300):
+        self.path = path
+        self.base = base
+        self.interval = interval
+        self.retry_after = retry_after
+        self.pegs = pegs if pegs else {"USDT": "USD"}
+        self.rates = {base: 1.0}
+        self.timestamp = 0
+        self._failed = 0
+        self._client = None
+        self._load_rates()
+
+    # -------------------------------------------------------------------------
+    # Rate table management
+    # -------------------------------------------------------------------------
+    def _load_rates(self):
+        try:
+            with open(self.path) as file:
+                stored = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if stored.get("base") != self.base:
+            print("Stored fiat rates are not based on %s. Ignoring them." %
+                  self.base)
+            return
+        self.rates.update(stored["rates"])
+        self.timestamp = stored["timestamp"]
+
+    def _store_rates(self):
+        stored = {"base": self.base, "timestamp": self.timestamp,
+                  "rates": self.rates}
+        write_atomic(self.path, lambda file: json.dump(stored, file),
+                     mode="w")
+
+    @property
+    def is_stale(self):
+        return time.time() - self.timestamp > self.interval
+
+    def refresh(self, force=False):
+        """Fetch a new rate table if the cached one has expired."""
+        if not force and not self.is_stale:
+            return self.rates
+        # Don't hit the network on every conversion while offline
+        if not force and time.time() - self._failed < self.retry_after:
+            return self.rates
+        if self._client is None:
+            from forex_python.converter import CurrencyRates
+            self._client = CurrencyRates()
+        try:
+            rates = self._client.get_rates(self.base)
+        except Exception as e:
+            self._failed = time.time()
+            print("Fiat rates could not be fetched, using cached rates.")
+            print(e)
+            return self.rates
+        self.rates.update({cur: float(rate) for cur, rate in rates.items()})
+        self.rates[self.base] = 1.0
+        self.timestamp = time.time()
+        self._store_rates()
+        return self.rates
+
+    def set_rate(self, currency, rate, quote=None):
+        """Set the price of ``currency`` in ``quote`` (default: base)."""
+        quote = quote if quote else self.base
+        self.rates[currency] = self._base_rate(quote) / rate
+        self.pegs.pop(currency, None)
+
+    # -------------------------------------------------------------------------
+    # Conversion methods
+    # -------------------------------------------------------------------------
+    def _base_rate(self, currency):
+        """Units of ``currency`` per unit of base."""
+        currency = self.pegs.get(currency, currency)
+        try:
+            return self.rates[currency]
+        except KeyError:
+            return np.nan
+
+    def rate(self, base, quote):
+        """Price of one unit of ``base`` in ``quote``."""
+        self.refresh()
+        return self._base_rate(quote) / self._base_rate(base)
+
+    def cross_rates(self, currencies):
+        """Matrix of prices with rows as base and columns as quote."""
+        self.refresh()
+        per_base = np.array([self._base_rate(c) for c in currencies])
+        return pd.DataFrame(np.outer(1 / per_base, per_base),
+                            index=currencies, columns=currencies)
+
+    def convert(self, amount, base, quote):
+        """Convert a scalar, array or Series from ``base`` to ``quote``."""
+        return amount * self.rate(base, quote)
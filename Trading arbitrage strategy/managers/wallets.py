@@ -1,19 +1,14 @@
 """Iota wallet classes"""
 #!/usr/bin/env python3
 
-import os
-from configparser import ConfigParser
 from iota import Iota, Address, BadApiResponse, Hash
 
+from TraderBetty.managers.config import read_config
 
-class IotaWallet(object):
-    def __init__(self, config_path):
-        self.config = ConfigParser()
-
-        if not os.path.isfile(config_path):
-            raise ValueError
 
-        self.config.read(config_path)
+class IotaWallet(object):
+    def __init__(self, config):
+        self.config = read_config(config)
         self.config_addresses = self.config.get('iota_wallet', 'addresses').split(',')
 
     def check_balance(self):
@@ -0,0 +1,23 @@
+"""Renders portfolio charts without a display."""
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib as mpl
+
+
+def make_pie_chart(labels, sizes, path, title=None, edgecolor="k"):
+    # Set style parameters
+    if not edgecolor:
+        mpl.rcParams['patch.force_edgecolor'] = False
+    else:
+        mpl.rcParams['patch.force_edgecolor'] = True
+        mpl.rcParams['patch.edgecolor'] = edgecolor
+
+    # Make figure
+    fig1, ax1 = plt.subplots()
+    ax1.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
+    ax1.axis("equal")
+    if title:
+        ax1.set_title(title)
+    fig1.savefig(path)
+    plt.close(fig1)
@@ -11,6 +11,7 @@ setup(name="TraderBetty", version=VERSION, author="iuvbio",
       test_suite="", tests_require=[],
       packages=find_packages(exclude=["data", "docs", "tests*"]),
       install_requires=["ccxt", "pandas"],
+      entry_points={"console_scripts": ["traderbetty=TraderBetty.cli:main"]},
       description="Cryptocurrency portfolio manager and arbitrage trader",
       license="MIT",  classifiers=["Development Status :: 4 - Beta",
                                    "Intended Audience :: Developers"],